@@ -1,19 +1,32 @@
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 import re
 from urllib.parse import urlparse
-from datetime import datetime
+from datetime import datetime, timezone
+from dateutil import parser as date_parser
 import os
-import json
+import orjson
+import hashlib
+import http.cookiejar
 from dotenv import load_dotenv
 import google.generativeai as genai
 import whois
 import requests 
+from requests.adapters import HTTPAdapter
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+from cachetools import TTLCache
+import tldextract
+import redis
 
 # --- Load Environment Variables and Configure Services ---
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 UPTIMEROBOT_API_KEY = os.getenv("UPTIMEROBOT_API_KEY")
+REDIS_URL = os.getenv("REDIS_URL")
+# Configurable so the next upstream model retirement is an env change, not an "AI analysis failed" outage
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 
 USE_GEMINI = bool(GEMINI_API_KEY)
 if USE_GEMINI:
@@ -27,13 +40,140 @@ if UPTIMEROBOT_API_KEY:
 else:
     print("WARNING: UptimeRobot API key not found. Reputation check is DISABLED.")
 
+if REDIS_URL:
+    print("Redis URL found. Cache shared across workers is ENABLED.")
+    REDIS = redis.Redis.from_url(REDIS_URL, socket_connect_timeout=0.2, socket_timeout=0.2)
+else:
+    print("WARNING: Redis URL not found. Caches are per worker only.")
+    REDIS = None
+
+# After a Redis error, skip Redis for 30 seconds so a hung server doesn't add its timeout to every call
+REDIS_FAILURE_CACHE = TTLCache(maxsize=1, ttl=30)
+REDIS_FAILURE_LOCK = threading.Lock()
+
+# Shared pool so the status, reputation and WHOIS lookups of a request run side by side.
+# Sized from GUNICORN_THREADS (the per-worker request threads set in gunicorn.conf.py) so that even with
+# every request thread busy, no lookup queues behind another request's slow WHOIS call.
+LOOKUPS_PER_REQUEST = 3
+LOOKUP_POOL = ThreadPoolExecutor(
+    max_workers=LOOKUPS_PER_REQUEST * int(os.getenv("GUNICORN_THREADS", "16")),
+    thread_name_prefix="lookup"
+)
+
+# One pooled session so repeat calls to UptimeRobot and repeat probes of a host reuse their TLS connections
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+# Probed URLs are user-chosen and often hostile, so nothing a site sets may persist into other users' probes
+HTTP_SESSION.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+# No retries: a retried timeout doubles the probe's worst case and surfaces as ConnectionError instead of Timeout
+for _scheme in ("http://", "https://"):
+    HTTP_SESSION.mount(_scheme, HTTPAdapter(pool_connections=64, pool_maxsize=128, max_retries=0))
+
+# Website status is meant to be live, so probes are only reused for a minute
+STATUS_CACHE = TTLCache(maxsize=10_000, ttl=60)
+STATUS_CACHE_LOCK = threading.Lock()
+
+# Built once with the bundled public-suffix snapshot, so no worker fetches the suffix list over the network.
+# Private suffixes (github.io, blogspot.com, ...) count as public so one user's site never vouches for another's.
+DOMAIN_EXTRACTOR = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None, include_psl_private_domains=True)
+
+# Creation dates never change, so WHOIS answers are kept for a day; failures are retried after 5 minutes
+WHOIS_CACHE = TTLCache(maxsize=10_000, ttl=86400)
+WHOIS_FAILURE_CACHE = TTLCache(maxsize=10_000, ttl=300)
+WHOIS_CACHE_LOCK = threading.Lock()
+
+# Identical URL + evidence always gets the same verdict, so skip the Gemini call for an hour
+VERDICT_CACHE = TTLCache(maxsize=50_000, ttl=3600)
+VERDICT_CACHE_LOCK = threading.Lock()
+
+# The UptimeRobot monitor list changes on a minutes-to-hours scale, so fetch it whole every 5 minutes
+MONITOR_CACHE = TTLCache(maxsize=1, ttl=300)
+# A failed fetch is not retried for a minute, so an UptimeRobot outage doesn't cost every request a timeout
+MONITOR_FAILURE_CACHE = TTLCache(maxsize=1, ttl=60)
+MONITOR_CACHE_LOCK = threading.Lock()
+# Only one thread refreshes the list; the others keep answering from the previous index meanwhile
+MONITOR_REFRESH_LOCK = threading.Lock()
+LAST_MONITOR_INDEX = None
+
+# All suspicious keywords in one alternation so the URL is scanned once, case-insensitively;
+# re.ASCII stops Unicode case folding (e.g. 'ſ' matching 's') from finding keywords the old substring scan didn't
+SUSPICIOUS_KEYWORDS_RE = re.compile(r'login|verify|bank|account|secure|update|signin', re.IGNORECASE | re.ASCII)
+
+
+# --- Shared Cache (Redis) ---
+# Sits behind each in-process cache so every gunicorn worker benefits from every lookup
+def shared_cache_available():
+    """True when Redis is configured and hasn't failed within the cooldown."""
+    if REDIS is None:
+        return False
+    with REDIS_FAILURE_LOCK:
+        return "redis" not in REDIS_FAILURE_CACHE
+
+
+def mark_shared_cache_failed(error):
+    """Logs a Redis error and opens the cooldown during which Redis is skipped."""
+    print(f"Redis error: {error} (skipping Redis for 30 seconds)")
+    with REDIS_FAILURE_LOCK:
+        REDIS_FAILURE_CACHE["redis"] = True
+
+
+def shared_cache_get(key, expected_type):
+    """Returns the JSON value stored under key in Redis, or None when missing, unusable or Redis is unavailable."""
+    if not shared_cache_available():
+        return None
+    try:
+        value = REDIS.get(key)
+        value = orjson.loads(value) if value is not None else None
+    except redis.RedisError as e:
+        mark_shared_cache_failed(e)
+        return None
+    except orjson.JSONDecodeError:
+        print(f"Ignoring undecodable Redis value under {key!r}")
+        return None
+    # A value of the wrong shape (foreign writer, older format) is treated as a miss
+    return value if isinstance(value, expected_type) else None
+
+
+def shared_cache_set(key, value, ttl):
+    """Stores value as JSON in Redis for ttl seconds; a Redis outage only costs the cache, never the request."""
+    if not shared_cache_available():
+        return
+    try:
+        REDIS.setex(key, ttl, orjson.dumps(value))
+    except redis.RedisError as e:
+        mark_shared_cache_failed(e)
+
+
+# --- Domain Normalization ---
+def get_domain_key(hostname):
+    """Returns the registrable domain (www.paypal.com -> paypal.com), or the hostname itself for IPs and unknown suffixes."""
+    hostname = (hostname or "").lower()
+    return DOMAIN_EXTRACTOR(hostname).top_domain_under_public_suffix or hostname
+
 
 # --- TOOL 1: Real-Time Website Status Checker ---
 def check_website_status(url):
+    """Returns the website's online status, reusing any probe from the last minute."""
+    with STATUS_CACHE_LOCK:
+        status = STATUS_CACHE.get(url)
+    if status is None:
+        status = shared_cache_get(f"status:{url}", str)
+        if status is None:
+            status = probe_website_status(url)
+            shared_cache_set(f"status:{url}", status, 60)
+        with STATUS_CACHE_LOCK:
+            STATUS_CACHE[url] = status
+    return status
+
+
+def probe_website_status(url):
     """Performs an instant check to see if a website is online."""
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=5, allow_redirects=True)
+        # Only the status code matters, so skip the body; fall back to a streamed GET for servers without HEAD
+        response = HTTP_SESSION.head(url, timeout=5, allow_redirects=True)
+        if response.status_code in (405, 501):
+            response = HTTP_SESSION.get(url, timeout=5, allow_redirects=True, stream=True)
+            response.close()
         return f"Online (Status: {response.status_code})" if 200 <= response.status_code < 300 else f"Responded with Error (Status: {response.status_code})"
     except requests.exceptions.SSLError: return "SSL Certificate Error"
     except requests.exceptions.Timeout: return "Offline (Request Timed Out)"
@@ -42,58 +182,174 @@ def check_website_status(url):
 
 
 # --- TOOL 2: UptimeRobot Reputation Check ---
-def get_uptimerobot_reputation(domain):
+def fetch_uptimerobot_monitors():
+    """Fetches every monitor on the account, keyed by the host it watches."""
+    api_url = "https://api.uptimerobot.com/v2/getMonitors"
+    monitors = {}
+    offset = 0
+    while True:
+        payload = {
+            "api_key": UPTIMEROBOT_API_KEY,
+            "format": "json",
+            "offset": offset,
+            "limit": 50
+        }
+        response = HTTP_SESSION.post(api_url, data=payload, timeout=5)
+        response.raise_for_status()
+        data = response.json()
+        if data.get("stat") != "ok":
+            raise ValueError(f"getMonitors failed: {data.get('error')}")
+
+        page = data.get("monitors") or []
+        for monitor in page:
+            monitor_url = monitor.get("url", "")
+            # HTTP/keyword monitors carry a full URL, ping/port monitors a bare host
+            hostname = urlparse(monitor_url if "://" in monitor_url else "//" + monitor_url).hostname
+            if hostname:
+                monitors.setdefault(get_domain_key(hostname), monitor)
+
+        offset += len(page)
+        if not page or offset >= data.get("pagination", {}).get("total", 0):
+            return monitors
+
+
+def get_monitor_index():
+    """Returns the cached monitor index, serving the previous one while a single thread refreshes it.
+
+    Returns None only when UptimeRobot has not answered since the process started.
+    """
+    global LAST_MONITOR_INDEX
+    with MONITOR_CACHE_LOCK:
+        monitors = MONITOR_CACHE.get("all")
+        cooling_down = "all" in MONITOR_FAILURE_CACHE
+        previous = LAST_MONITOR_INDEX
+    if monitors is not None:
+        return monitors
+    if cooling_down:
+        return previous
+
+    # With no previous index there is nothing to serve, so wait for the refresh instead of skipping it
+    if not MONITOR_REFRESH_LOCK.acquire(blocking=previous is None):
+        return previous
+    try:
+        # Another thread may have refreshed (or failed) while this one waited for the lock
+        with MONITOR_CACHE_LOCK:
+            monitors = MONITOR_CACHE.get("all")
+            cooling_down = "all" in MONITOR_FAILURE_CACHE
+            previous = LAST_MONITOR_INDEX
+        if monitors is not None or cooling_down:
+            return monitors if monitors is not None else previous
+
+        try:
+            monitors = shared_cache_get("uptimerobot:monitors:v2", dict)
+            if monitors is None:
+                monitors = fetch_uptimerobot_monitors()
+                shared_cache_set("uptimerobot:monitors:v2", monitors, 300)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"UptimeRobot API error: {e}")
+            with MONITOR_CACHE_LOCK:
+                MONITOR_FAILURE_CACHE["all"] = True
+            return previous
+
+        with MONITOR_CACHE_LOCK:
+            MONITOR_CACHE["all"] = LAST_MONITOR_INDEX = monitors
+        return monitors
+    finally:
+        MONITOR_REFRESH_LOCK.release()
+
+
+def get_uptimerobot_reputation(hostname):
     """Checks if a domain is monitored by UptimeRobot and gets its reputation."""
     if not UPTIMEROBOT_API_KEY:
         return "Not configured"
     
-    api_url = "https://api.uptimerobot.com/v2/getMonitors"
-    payload = {
-        "api_key": UPTIMEROBOT_API_KEY,
-        "format": "json",
-        "search": domain
-    }
-    try:
-        response = requests.post(api_url, data=payload, timeout=5)
-        response.raise_for_status()
-        data = response.json()
+    monitors = get_monitor_index()
+    if monitors is None:
+        return "Could not be determined"
+
+    monitor = monitors.get(get_domain_key(hostname))
+    if monitor:
+        status_map = {0: "Paused", 1: "Not Checked Yet", 2: "Up", 8: "Seems Down", 9: "Down"}
+        status_text = status_map.get(monitor.get("status"), "Unknown")
+        uptime_ratio = monitor.get("custom_uptime_ratio", "N/A")
+        return f"Monitored - Status: {status_text} (Uptime: {uptime_ratio}%)"
+    else:
+        return "Not found in monitoring service"
+
+
+# --- TOOL 3: WHOIS Domain Age Lookup ---
+def normalize_creation_date(creation_date):
+    """Coerces the list/str/naive/aware shapes WHOIS backends return into one aware UTC datetime."""
+    if isinstance(creation_date, list): creation_date = creation_date[0] if creation_date else None
+    if isinstance(creation_date, str): creation_date = date_parser.parse(creation_date)
+    if not isinstance(creation_date, datetime):
+        return None
+    if creation_date.tzinfo is None:
+        return creation_date.replace(tzinfo=timezone.utc)
+    return creation_date.astimezone(timezone.utc)
+
+
+def get_domain_creation_date(hostname):
+    """Returns the WHOIS creation date, cached per registrable domain (www.paypal.com -> paypal.com)."""
+    registered_domain = DOMAIN_EXTRACTOR(hostname).top_domain_under_public_suffix
+    if not registered_domain:
+        # IP literals and unknown suffixes have nothing WHOIS could answer for
+        return None
 
-        if data.get("stat") == "ok" and data.get("monitors"):
-            monitor = data["monitors"][0]
-            status_map = {0: "Paused", 1: "Not Checked Yet", 2: "Up", 8: "Seems Down", 9: "Down"}
-            status_text = status_map.get(monitor.get("status"), "Unknown")
-            uptime_ratio = monitor.get("custom_uptime_ratio", "N/A")
-            return f"Monitored - Status: {status_text} (Uptime: {uptime_ratio}%)"
+    with WHOIS_CACHE_LOCK:
+        if registered_domain in WHOIS_CACHE:
+            return WHOIS_CACHE[registered_domain]
+        if registered_domain in WHOIS_FAILURE_CACHE:
+            return None
+
+    shared_key = f"whois:{registered_domain}"
+    cached = shared_cache_get(shared_key, dict)
+    if cached is not None:
+        creation_date = datetime.fromisoformat(cached["creation_date"]) if cached.get("creation_date") else None
+    else:
+        try:
+            creation_date = normalize_creation_date(whois.whois(registered_domain).creation_date)
+        except Exception:
+            creation_date = None
+        shared_cache_set(shared_key, {"creation_date": creation_date}, 86400 if creation_date else 300)
+
+    with WHOIS_CACHE_LOCK:
+        if creation_date:
+            WHOIS_CACHE[registered_domain] = creation_date
         else:
-            return "Not found in monitoring service"
-    except requests.exceptions.RequestException as e:
-        print(f"UptimeRobot API error: {e}")
+            WHOIS_FAILURE_CACHE[registered_domain] = True
+    return creation_date
+
+
+def get_domain_age(hostname):
+    """Looks up the domain's creation date via WHOIS and returns its age."""
+    try:
+        creation_date = get_domain_creation_date(hostname)
+        return f"{(datetime.now(timezone.utc) - creation_date).days} days" if creation_date else "Could not be determined"
+    except Exception:
         return "Could not be determined"
 
 
-# --- TOOL 3 & OTHERS: Feature Extraction Function ---
+# --- Feature Extraction Function ---
 def extract_url_features(url):
     """Calculates all features to provide as evidence to the AI."""
     features = {}
     try:
         parsed_url = urlparse(url)
-        domain = parsed_url.netloc
 
-        features["Real-Time Status"] = check_website_status(url)
-        features["Monitoring Reputation"] = get_uptimerobot_reputation(domain)
+        # The three network lookups are independent, so fan them out and wait on the slowest
+        status_future = LOOKUP_POOL.submit(check_website_status, url)
+        reputation_future = LOOKUP_POOL.submit(get_uptimerobot_reputation, parsed_url.hostname)
+        age_future = LOOKUP_POOL.submit(get_domain_age, parsed_url.hostname)
+
+        features["Real-Time Status"] = status_future.result()
+        features["Monitoring Reputation"] = reputation_future.result()
         features["URL Length"] = len(url)
         features["Uses HTTPS"] = "Yes" if parsed_url.scheme == 'https' else "No"
         
-        keywords = ["login", "verify", "bank", "account", "secure", "update", "signin"]
-        features["Number of Suspicious Keywords"] = sum(1 for keyword in keywords if keyword in url.lower())
-
-        try:
-            domain_info = whois.whois(domain)
-            creation_date = domain_info.creation_date
-            if isinstance(creation_date, list): creation_date = creation_date[0]
-            features["Domain Age"] = f"{(datetime.now() - creation_date).days} days" if creation_date else "Could not be determined"
-        except Exception:
-            features["Domain Age"] = "Could not be determined"
+        # Counts distinct keywords, not occurrences, matching the evidence the AI has always been given
+        features["Number of Suspicious Keywords"] = len({match.lower() for match in SUSPICIOUS_KEYWORDS_RE.findall(url)})
+        features["Domain Age"] = age_future.result()
             
         return features
     except Exception as e:
@@ -101,31 +357,166 @@ def extract_url_features(url):
         return None
 
 # --- AI Analysis Function ---
+# Structured output makes Gemini reply with bare JSON matching this schema, so no fence-stripping is needed
+GEMINI_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "object",
+        "properties": {
+            "verdict": {"type": "string", "enum": ["Phishing Detected", "High Risk", "Suspicious", "Looks Safe"]},
+            "reason": {"type": "string"}
+        },
+        "required": ["verdict", "reason"]
+    }
+}
+GEMINI_MODEL = genai.GenerativeModel(GEMINI_MODEL_NAME, generation_config=GEMINI_GENERATION_CONFIG) if USE_GEMINI else None
+
+# Static parts of the prompt; only the URL and the evidence list change between requests
+GEMINI_PROMPT_HEAD = (
+    'As a cybersecurity expert, analyze the following URL based on the evidence. '
+    'Classify it as "Phishing Detected", "High Risk", "Suspicious", or "Looks Safe".\n'
+    'URL: "'
+)
+GEMINI_PROMPT_MID = '"\nEvidence:\n'
+GEMINI_PROMPT_TAIL = (
+    '\nA site with a positive "Monitoring Reputation" is a strong sign of legitimacy.\n'
+    "If the 'Real-Time Status' evidence starts with 'Online', mention in your 'reason' that the website is confirmed to be live.\n"
+    'Respond ONLY with a valid JSON object with two keys: "verdict" and "reason".\n'
+)
+
 def analyze_with_gemini(url, features):
     if not USE_GEMINI: 
         return {"verdict": "Error", "reason": "AI is not configured."}
+
+    cache_key = hashlib.blake2b(orjson.dumps({"u": url, "f": features}, option=orjson.OPT_SORT_KEYS), digest_size=16).digest()
+    with VERDICT_CACHE_LOCK:
+        cached_result = VERDICT_CACHE.get(cache_key)
+    if cached_result is None:
+        cached_result = shared_cache_get(b"verdict:" + cache_key, dict)
+        if cached_result is not None and not {"verdict", "reason"} <= cached_result.keys():
+            cached_result = None
+        if cached_result is not None:
+            with VERDICT_CACHE_LOCK:
+                VERDICT_CACHE[cache_key] = cached_result
+    if cached_result is not None:
+        return cached_result
     
     try:
-        model = genai.GenerativeModel('gemini-pro')
-        feature_string = "\n".join([f"- {key}: {value}" for key, value in features.items()])
-        prompt = f'''
-        As a cybersecurity expert, analyze the following URL based on the evidence. Classify it as "Phishing Detected", "High Risk", "Suspicious", or "Looks Safe".
-        URL: "{url}"
-        Evidence:
-        {feature_string}
-        A site with a positive "Monitoring Reputation" is a strong sign of legitimacy.
-        If the 'Real-Time Status' evidence starts with 'Online', mention in your 'reason' that the website is confirmed to be live.
-        Respond ONLY with a valid JSON object with two keys: "verdict" and "reason".
-        '''
-        response = model.generate_content(prompt)
-        cleaned_text = response.text.strip().replace("```json", "").replace("```", "")
-        return json.loads(cleaned_text)
+        feature_string = "\n".join(f"- {key}: {value}" for key, value in features.items())
+        prompt = "".join((GEMINI_PROMPT_HEAD, url, GEMINI_PROMPT_MID, feature_string, GEMINI_PROMPT_TAIL))
+        response = GEMINI_MODEL.generate_content(prompt)
+        result = orjson.loads(response.text)
+        with VERDICT_CACHE_LOCK:
+            VERDICT_CACHE[cache_key] = result
+        shared_cache_set(b"verdict:" + cache_key, result, 3600)
+        return result
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
         return {"verdict": "Suspicious", "reason": "AI analysis failed."}
 
+# --- Input Validation ---
+MAX_URL_LENGTH = 2048
+# \w keeps internationalized (IDN) hostnames valid; colons cover IPv6 literals
+HOSTNAME_RE = re.compile(r'^[\w.\-:]+$')
+
+# Exact hosts only: subdomains like docs.google.com or sites.google.com can carry user-made phishing pages
+TRUSTED_HOSTS = frozenset({
+    "google.com", "www.google.com",
+    "github.com", "www.github.com",
+    "microsoft.com", "www.microsoft.com",
+    "apple.com", "www.apple.com",
+    "amazon.com", "www.amazon.com",
+    "wikipedia.org", "www.wikipedia.org", "en.wikipedia.org",
+    "youtube.com", "www.youtube.com",
+    "linkedin.com", "www.linkedin.com",
+})
+
+
+def get_valid_hostname(url):
+    """Returns the URL's hostname, or None if the URL is too long or malformed to be worth looking up."""
+    if len(url) > MAX_URL_LENGTH:
+        return None
+    try:
+        hostname = urlparse(url).hostname
+    except ValueError:
+        return None
+    return hostname if hostname and HOSTNAME_RE.match(hostname) else None
+
+
+def is_bare_host_url(url):
+    """True when the URL is just scheme + host, e.g. https://www.google.com/.
+
+    Trusted hosts still run open redirects (google.com/url?q=..., linkedin.com/redir/...), so any path,
+    query, fragment, userinfo or port means the URL has to go through the full analysis.
+    """
+    parsed = urlparse(url)
+    return (
+        parsed.path in ("", "/")
+        and not (parsed.params or parsed.query or parsed.fragment)
+        and parsed.netloc.lower() == parsed.hostname
+    )
+
+
+# --- Analysis Pipeline ---
+# Futures of analyses currently running in this worker, so concurrent requests for one URL share a run
+INFLIGHT_ANALYSES = {}
+INFLIGHT_LOCK = threading.Lock()
+
+
+def run_analysis(url):
+    """Gathers the evidence for a URL and asks the AI for a verdict; returns None if the URL could not be processed."""
+    features = extract_url_features(url)
+    if not features:
+        return None
+        
+    ai_result = analyze_with_gemini(url, features)
+    
+    # This ensures all tool findings are sent to the frontend
+    findings = [{"description": f"AI Analysis: {ai_result['reason']}"}]
+    for key, value in features.items():
+        findings.append({"description": f"{key}: {value}"})
+    return {"verdict": ai_result['verdict'], "findings": findings}
+
+
+def analyze_once(url):
+    """Runs the analysis pipeline, letting identical requests that arrive meanwhile wait on the same result."""
+    with INFLIGHT_LOCK:
+        future = INFLIGHT_ANALYSES.get(url)
+        is_leader = future is None
+        if is_leader:
+            future = INFLIGHT_ANALYSES[url] = Future()
+    if not is_leader:
+        return future.result()
+
+    try:
+        result = run_analysis(url)
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with INFLIGHT_LOCK:
+            INFLIGHT_ANALYSES.pop(url, None)
+
+
 # --- Flask App Setup & Endpoint (This is the critical fix) ---
+class ORJSONProvider(JSONProvider):
+    """Routes jsonify() and request.get_json() through orjson instead of the stdlib json module."""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Skip the bytes -> str -> bytes round trip that dumps() would cause
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype="application/json")
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 # Add your new Netlify URL to the list of allowed origins
 allowed_origins = [
@@ -133,31 +524,42 @@ allowed_origins = [
     "https://phishing-url-checker.netlify.app", # YOUR LIVE FRONTEND
     "https://phishing-detector-api-d3mu.onrender.com"  # Your backend's own URL
 ]
-CORS(app, resources={r"/analyze": {"origins": allowed_origins}})
+# Behind nginx (deploy/nginx.conf) CORS is answered by the proxy, so preflights never reach Python.
+# Otherwise handle it here, letting browsers cache each preflight for up to 2 hours.
+if not os.getenv("CORS_HANDLED_BY_PROXY"):
+    CORS(app, resources={r"/analyze": {"origins": allowed_origins}}, max_age=7200)
 
 @app.route('/analyze', methods=['POST'])
 def analyze():
     raw_url = request.get_json().get('url', '').strip()
     if not raw_url:
         return jsonify({"error": "URL is required"}), 400
-    full_url_for_analysis = raw_url if re.match(r'^(https?://)', raw_url) else 'https://' + raw_url
+    full_url_for_analysis = raw_url if raw_url.startswith(('http://', 'https://')) else 'https://' + raw_url
+
+    # Reject junk and answer well-known sites before paying for any network lookups
+    hostname = get_valid_hostname(full_url_for_analysis)
+    if not hostname:
+        return jsonify({"error": "URL is not valid"}), 400
+    if hostname in TRUSTED_HOSTS and is_bare_host_url(full_url_for_analysis):
+        return jsonify({
+            "url": raw_url,
+            "verdict": "Looks Safe",
+            "findings": [{"description": f"Trusted Domain: {hostname} is a well-known legitimate website"}]
+        })
     
-    features = extract_url_features(full_url_for_analysis)
-    if not features:
+    result = analyze_once(full_url_for_analysis)
+    if not result:
         return jsonify({"error": "Could not process the URL"}), 500
         
-    ai_result = analyze_with_gemini(full_url_for_analysis, features)
-    
-    # This ensures all tool findings are sent to the frontend
-    findings = [{"description": f"AI Analysis: {ai_result['reason']}"}]
-    for key, value in features.items():
-        findings.append({"description": f"{key}: {value}"})
-        
     return jsonify({
         "url": raw_url, 
-        "verdict": ai_result['verdict'], 
-        "findings": findings
+        "verdict": result['verdict'], 
+        "findings": result['findings']
     })
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000, ssl_context='adhoc')
\ No newline at end of file
+    # Local development only (production runs under gunicorn, see gunicorn.conf.py).
+    # Point DEV_SSL_CERT/DEV_SSL_KEY at a mkcert pair to avoid a new self-signed cert on every start.
+    cert_file, key_file = os.getenv("DEV_SSL_CERT"), os.getenv("DEV_SSL_KEY")
+    ssl_context = (cert_file, key_file) if cert_file and key_file else 'adhoc'
+    app.run(debug=True, port=5000, ssl_context=ssl_context)
@@ -0,0 +1,12 @@
+# Gunicorn settings, picked up automatically by `gunicorn app:app`.
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+
+# Each request spends its time waiting on WHOIS, HTTP and Gemini calls, so threaded
+# workers keep serving other requests while those calls block.
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+# app.py reads the same variable to size LOOKUP_POOL
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+timeout = 60